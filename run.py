@@ -1,6 +1,6 @@
 import twitchAPI
 from vodloader_config import vodloader_config
-from vodloader import vodloader
+from vodloader import vodloader, get_backoff
 from twitchAPI import Twitch, EventSub
 import vodloader_ssl
 from streamlink import Streamlink
@@ -10,11 +10,15 @@ import logging
 import logging.handlers
 import ssl
 import time
+import re
 import pytz
 import argparse
 
 SSL_PORT = 443
 DEFAULT_RETRIES = 10
+HLS_SEGMENT_THREADS = 4
+CHANNEL_REGEX = re.compile(r'\w{3,25}', re.ASCII)
+LOG_FORMATTER = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
 
 def parse_args():
     parser = argparse.ArgumentParser(prog='vodloader', description='Automate uploading Twitch streams to YouTube')
@@ -26,15 +30,16 @@ def load_config(filename):
     config = vodloader_config(filename)
     if not config['download']['directory'] or config['download']['directory'] == "":
         config['download']['directory'] = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'videos')
-    if not os.path.isdir(config['download']['directory']):
-        os.mkdir(config['download']['directory'])
+    os.makedirs(config['download']['directory'], exist_ok=True)
+    config['twitch']['channels'] = {str(channel): settings for channel, settings in config['twitch']['channels'].items()}
     for channel in config['twitch']['channels']:
-        if not 'timezone' in config['twitch']['channels'][channel] or config['twitch']['channels'][channel]['timezone'] == '':
+        if not CHANNEL_REGEX.fullmatch(channel):
+            sys.exit(f'channel name {channel} in {filename} is not a valid Twitch login!')
+        if not config['twitch']['channels'][channel].get('timezone'):
             config['twitch']['channels'][channel]['timezone'] ='UTC'
-        if not config['twitch']['channels'][channel]['timezone'] in pytz.all_timezones:
+        if not config['twitch']['channels'][channel]['timezone'] in pytz.all_timezones_set:
             sys.exit(f'timezone entry for {channel} in {filename} is invalid!')
-    if not 'sort' in config['youtube']:
-        config['youtube']['sort'] = True
+    config['youtube'].setdefault('sort', True)
     config.save()
     return config
 
@@ -50,15 +55,13 @@ def setup_logger(logname, logpath="", debug=False):
         logpath = os.path.join(os.path.dirname(__file__), 'logs')
     else:
         logpath = os.path.abspath(logpath)
-    if not os.path.exists(logpath):
-        os.mkdir(logpath)
+    os.makedirs(logpath, exist_ok=True)
     logger = logging.getLogger(logname)
     logger.setLevel(logging.DEBUG)
     file_handler = logging.handlers.TimedRotatingFileHandler(os.path.join(logpath, logname), when='midnight')
     stream_handler = logging.StreamHandler()
-    form = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
-    file_handler.setFormatter(form)
-    stream_handler.setFormatter(form)
+    file_handler.setFormatter(LOG_FORMATTER)
+    stream_handler.setFormatter(LOG_FORMATTER)
     if debug:
         file_handler.setLevel(logging.DEBUG)
         stream_handler.setLevel(logging.DEBUG)
@@ -66,23 +69,30 @@ def setup_logger(logname, logpath="", debug=False):
         file_handler.setLevel(logging.INFO)
         stream_handler.setLevel(logging.INFO)
     root_logger = logging.getLogger()
-    for handler in root_logger.handlers:
+    for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
     root_logger.addHandler(file_handler)
     root_logger.addHandler(stream_handler)
-    twitchapi_logger = logging.getLogger('twitchAPI')
-    twitchapi_logger.addHandler(file_handler)
-    twitchapi_logger.addHandler(stream_handler)
     return logger
     
 def setup_streamlink():
-    return Streamlink()
+    sl = Streamlink()
+    sl.set_option('hls-segment-threads', HLS_SEGMENT_THREADS)
+    return sl
 
 def setup_twitch(client_id, client_secret):
     twitch = Twitch(client_id, client_secret)
     twitch.authenticate_app([])
     return twitch
 
+def get_user_ids(twitch:Twitch, channels):
+    channels = list(channels)
+    user_ids = {}
+    for i in range(0, len(channels), 100):
+        for user in twitch.get_users(logins=channels[i:i+100])['data']:
+            user_ids[user['login']] = user['id']
+    return user_ids
+
 def setup_eventsub(host, port, client_id, cert, key, twitch:Twitch):
     ssl_context = ssl.create_default_context(purpose=ssl.Purpose.CLIENT_AUTH)
     ssl_context.load_cert_chain(certfile=cert, keyfile=key)
@@ -96,7 +106,7 @@ def setup_eventsub(host, port, client_id, cert, key, twitch:Twitch):
             if webhook_retries > DEFAULT_RETRIES:
                 raise RetryExceeded()
             else:
-                time.sleep(1)
+                time.sleep(get_backoff(webhook_retries))
                 webhook_retries += 1
     hook.unsubscribe_all()
     hook.start()
@@ -124,17 +134,20 @@ def main():
     hook = setup_eventsub(config['twitch']['webhook']['host'], SSL_PORT, config['twitch']['client_id'], config['twitch']['webhook']['ssl_cert'], config['twitch']['webhook']['ssl_key'], twitch)
     logger.info(f'Initiating vodloaders')
     sl = setup_streamlink()
+    user_ids = get_user_ids(twitch, config['twitch']['channels'])
     vodloaders = []
     for channel in config['twitch']['channels']:
-        vodloaders.append(vodloader(sl, channel, twitch, hook, config['twitch']['channels'][channel], config['youtube']['json'], config['download']['directory'], config['download']['keep'], config['youtube']['upload'], config['youtube']['sort'], config['download']['quota_pause'], pytz.timezone(config['twitch']['channels'][channel]['timezone'])))
+        vodloaders.append(vodloader(sl, channel, twitch, hook, config['twitch']['channels'][channel], config['youtube']['json'], config['download']['directory'], config['download']['keep'], config['youtube']['upload'], config['youtube']['sort'], config['download']['quota_pause'], pytz.timezone(config['twitch']['channels'][channel]['timezone']), user_ids.get(str(channel).lower())))
     try:
         if config['twitch']['webhook']['ssl_cert_manager']:
             cert_manager.start(lambda: renew_webhook(hook, config['twitch']['webhook']['ssl_cert'], config['twitch']['webhook']['ssl_key'], twitch, vodloaders))
         while True:
             time.sleep(600)
-    except:
+    except KeyboardInterrupt:
+        pass
+    finally:
         if config['twitch']['webhook']['ssl_cert_manager']:
-            cert_manager.stop = True
+            cert_manager.stop()
         logger.info(f'Shutting down')
         for v in vodloaders:
             v.end = True
@@ -1,18 +1,28 @@
-from twitchAPI.types import VideoType, EventSubSubscriptionConflict, EventSubSubscriptionTimeout, EventSubSubscriptionError
+from twitchAPI.types import VideoType, EventSubSubscriptionConflict, EventSubSubscriptionTimeout, EventSubSubscriptionError, TwitchAPIException
 from time import sleep
 from threading import Thread
+import asyncio
+import functools
+import random
 import logging
+import requests
 from vodloader_video import vodloader_video
 from vodloader_status import vodloader_status
 from youtube_uploader import YouTubeOverQuota, youtube_uploader
-import datetime
 import pytz
 import os
 
+STREAM_RETRIES = 10
+RETRY_BACKOFF_CAP = 30
+
+
+def get_backoff(attempt):
+    return random.uniform(0, min(RETRY_BACKOFF_CAP, 2 ** attempt))
+
 
 class vodloader(object):
 
-    def __init__(self, sl, channel, twitch, webhook, twitch_config, yt_json, download_dir, keep=False, upload=True, sort=True, quota_pause=True, tz=pytz.timezone("America/Chicago")):
+    def __init__(self, sl, channel, twitch, webhook, twitch_config, yt_json, download_dir, keep=False, upload=True, sort=True, quota_pause=True, tz=pytz.timezone("America/Chicago"), user_id=None):
         self.streamlink = sl
         self.end = False
         self.channel = channel
@@ -31,23 +41,16 @@ class vodloader(object):
                 self.uploader.sort_playlist_by_timestamp(twitch_config['youtube_param']['playlistId'])
         else:
             self.uploader = None
-        self.user_id = self.get_user_id()
+        self.user_id = user_id or self.get_user_id()
         self.status = vodloader_status(self.user_id)
         self.sync_status()
+        self.livestream = None
+        self.stream_task = None
         self.get_live()
         self.webhook_subscribe()
-        if 'chapters' in twitch_config and twitch_config['chapters'] != "":
-            self.chapters_type = twitch_config['chapters']
-        else:
-            self.chapters_type = False
-        if 'quality' in twitch_config and twitch_config['quality'] != "":
-            self.quality = twitch_config['quality']
-        else:
-            self.quality = 'best'
-        if 'backlog' in twitch_config and twitch_config['backlog']:
-            self.backlog = twitch_config['backlog']
-        else:
-            self.backlog = False
+        self.chapters_type = twitch_config.get('chapters') or False
+        self.quality = twitch_config.get('quality') or 'best'
+        self.backlog = twitch_config.get('backlog') or False
         if self.backlog:
             self.backlog_process = Thread(target=self.backlog_buffload, args=(), daemon=True)
             self.backlog_process.start()
@@ -58,32 +61,61 @@ class vodloader(object):
     async def callback_online(self, data: dict):
         if not self.live:
             self.live = True
+            self.livestream = None
             self.logger.info(f'{self.channel} has gone live!')
-            data = self.twitch.get_streams(user_id=self.user_id)['data'][0]
-            url = 'https://www.twitch.tv/' + self.channel
-            self.livestream = vodloader_video(self, url, data, backlog=False, quality=self.quality)
+            if self.stream_task:
+                self.stream_task.cancel()
+            self.stream_task = asyncio.ensure_future(self.start_livestream())
+
+    async def start_livestream(self):
+        task = self.stream_task
+        data = await self.get_stream_data()
+        if not self.live or self.stream_task is not task:
+            return
+        if data is None:
+            self.logger.error(f'Could not retrieve stream data for {self.channel}')
+            self.live = False
+            return
+        url = 'https://www.twitch.tv/' + self.channel
+        self.livestream = vodloader_video(self, url, data, backlog=False, quality=self.quality)
     
     async def callback_offline(self, data: dict):
         self.live = False
+        if self.stream_task:
+            self.stream_task.cancel()
         self.logger.info(f'{self.channel} has gone offline')
     
     async def callback_channel_update(self, data:dict):
-        if self.live:
-            data = data['event']
-            if self.livestream.chapters.get_current_game() != data["category_name"]:
-                self.logger.info(f'{self.channel} has changed game to {data["category_name"]}')
-            if self.livestream.chapters.get_current_title() != data["title"]:
-                self.logger.info(f'{self.channel} has changed their title to {data["title"]}')
-            self.livestream.chapters.append(data['category_name'], data['title'])
+        if self.live and self.livestream:
+            game = data['event']['category_name']
+            title = data['event']['title']
+            chapters = self.livestream.chapters
+            if chapters.get_current_game() != game:
+                self.logger.info(f'{self.channel} has changed game to {game}')
+            if chapters.get_current_title() != title:
+                self.logger.info(f'{self.channel} has changed their title to {title}')
+            chapters.append(game, title)
+
+    async def get_stream_data(self, retry=STREAM_RETRIES):
+        loop = asyncio.get_event_loop()
+        for attempt in range(retry):
+            try:
+                response = await loop.run_in_executor(None, functools.partial(self.twitch.get_streams, user_id=self.user_id))
+                streams = response.get('data')
+                if streams is None:
+                    self.logger.error(f'Could not fetch streams for {self.channel}: {response}')
+            except (TwitchAPIException, requests.RequestException, KeyError) as e:
+                self.logger.error(e)
+                streams = None
+            if streams:
+                return streams[0]
+            if attempt < retry - 1:
+                await asyncio.sleep(get_backoff(attempt))
+        return None
 
     def get_live(self):
-        data = self.twitch.get_streams(user_id=self.user_id)
-        if not data['data']:
-            self.live = False
-        elif data['data'][0]['type'] == 'live':
-            self.live = True
-        else:
-            self.live = False
+        streams = self.twitch.get_streams(user_id=self.user_id)['data']
+        self.live = bool(streams) and streams[0]['type'] == 'live'
         return self.live
 
     def webhook_unsubscribe(self):
@@ -113,7 +145,7 @@ class vodloader(object):
         return user_info['data'][0]['id']
     
     def sync_status(self):
-        ids = []
+        ids = set()
         for id in self.status.copy():
             if self.status[id] == False:
                 if not os.path.isfile(os.path.join(self.download_dir, f'{id}.ts')):
@@ -122,9 +154,9 @@ class vodloader(object):
             for video in self.uploader.get_channel_videos():
                 if video['tvid']:
                     if video['part'] and video['part'] > 1:
-                        ids.append(f'{video["tvid"]}p{video["part"]}')
+                        ids.add(f'{video["tvid"]}p{video["part"]}')
                     else:
-                        ids.append(str(video['tvid']))
+                        ids.add(str(video['tvid']))
             for id in self.status.copy():
                 if not id in ids and self.status[id] == True:
                     self.status.pop(id)
@@ -139,10 +171,8 @@ class vodloader(object):
         cursor = None
         videos = []
         while True:
-            data = self.twitch.get_videos(user_id=self.user_id, first=100, after=cursor)
-            for video in data['data']:
-                if video['type'] == video_type:
-                    videos.append(video)
+            data = self.twitch.get_videos(user_id=self.user_id, first=100, after=cursor, video_type=video_type)
+            videos.extend(data['data'])
             if not 'cursor' in data['pagination']:
                 break
             else:
@@ -151,7 +181,7 @@ class vodloader(object):
     
     def backlog_buffload(self):
         videos = self.get_twitch_videos()
-        videos.sort(reverse=False, key=lambda x: datetime.datetime.strptime((x['created_at']), '%Y-%m-%dT%H:%M:%SZ'))
+        videos.sort(reverse=False, key=lambda x: x['created_at'])
         for video in videos:
             if self.end: exit()
             if self.uploader.pause and self.quota_pause:
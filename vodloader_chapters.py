@@ -18,10 +18,7 @@ class vodloader_chapters(object):
         self.timestamps.append((timestamp, game, title))
 
     def get_games(self):
-        games = list(map(lambda x :x[1], self.timestamps))
-        out = []
-        [out.append(x) for x in games if x not in out]
-        return out
+        return list(dict.fromkeys(x[1] for x in self.timestamps))
 
     def get_current_game(self):
         return self.timestamps[-1][1]
@@ -36,32 +33,23 @@ class vodloader_chapters(object):
         return self.timestamps[0][2]
 
     def get_game_chapters(self):
-        out = f'{self.timestamps[0][0]} {self.timestamps[0][1]}\n'
-        count = 1
-        for i in range(1, len(self.timestamps)):
-            if self.timestamps[i][1] != self.timestamps[i-1][1]:
-                out += f'{self.timestamps[i][0]} {self.timestamps[i][1]}\n'
-                count += 1
-        if count > 2:
-            return out
-        else:
-            return None
+        return self.get_chapters(1)
 
     def get_title_chapters(self):
-        out = f'{self.timestamps[0][0]} {self.timestamps[0][2]}\n'
-        count = 1
+        return self.get_chapters(2)
+
+    def get_chapters(self, field):
+        lines = [f'{self.timestamps[0][0]} {self.timestamps[0][field]}\n']
         for i in range(1, len(self.timestamps)):
-            if self.timestamps[i][2] != self.timestamps[i-1][2]:
-                out += f'{self.timestamps[i][0]} {self.timestamps[i][2]}\n'
-                count += 1
-        if count > 2:
-            return out
+            if self.timestamps[i][field] != self.timestamps[i-1][field]:
+                lines.append(f'{self.timestamps[i][0]} {self.timestamps[i][field]}\n')
+        if len(lines) > 2:
+            return ''.join(lines)
         else:
             return None
     
     @staticmethod
     def get_timestamp_from_sec(seconds):
-        hours = floor(seconds/3600)
-        mins = floor(seconds%3600/60)
-        secs = floor(seconds%60)
-        return f'{str(hours).zfill(2)}:{str(mins).zfill(2)}:{str(secs).zfill(2)}'
\ No newline at end of file
+        mins, secs = divmod(floor(seconds), 60)
+        hours, mins = divmod(mins, 60)
+        return f'{hours:02}:{mins:02}:{secs:02}'
\ No newline at end of file
@@ -10,7 +10,7 @@ class vodloader_config(dict):
         self.clear()
         with open(self.filename, 'r') as stream:
             try:
-                self.update(yaml.safe_load(stream).copy())
+                self.update(yaml.safe_load(stream))
             except yaml.YAMLError as e:
                 print(e)
     
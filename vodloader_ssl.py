@@ -13,11 +13,12 @@ from contextlib import contextmanager
 import pickle
 from datetime import datetime
 import time
-from threading import Thread
+from threading import Thread, Event
 
 DIRECTORY_URL = 'https://acme-v02.api.letsencrypt.org/directory'
 USER_KEY_SIZE = 2048
 CERT_KEY_SIZE = 2048
+RENEW_CHECK_INTERVAL = 86400
 PORT = 80
 USER_AGENT = 'vodloader'
 SSL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ssl')
@@ -124,7 +125,8 @@ def cert_expiration_datetime(fullchain:bytes):
 class cert_manager():
 
     def __init__(self, email:str, domain:str):
-        self.stop = False
+        self.stopped = Event()
+        self.renew_thread = None
         self.email = email
         self.domain = domain
         self.privkey_path = os.path.join(SSL_DIR, PRIVKEY_FILENAME)
@@ -133,8 +135,7 @@ class cert_manager():
         self.setup_cert()
     
     def setup_cert(self):
-        if not os.path.isdir(SSL_DIR):
-            os.mkdir(SSL_DIR)
+        os.makedirs(SSL_DIR, exist_ok=True)
         if os.path.isfile(self.user_path):
             user, regr = user_load()
         else:
@@ -168,10 +169,11 @@ class cert_manager():
     def renew_loop(self, callback=None):
         while True:
             expiration = cert_expiration_datetime(self.read_fullchain()).timestamp() - 86400
-            while time.time() < expiration:
-                if self.stop:
-                    return
-                time.sleep(1)
+            remaining = expiration - time.time()
+            if self.stopped.wait(max(0, min(remaining, RENEW_CHECK_INTERVAL))):
+                return
+            if remaining > RENEW_CHECK_INTERVAL:
+                continue
             self.renew()
             if callback:
                 Thread(target=callback).start()
@@ -180,6 +182,11 @@ class cert_manager():
         self.renew_thread = Thread(target=self.renew_loop, args=(callback,))
         self.renew_thread.start()
 
+    def stop(self):
+        self.stopped.set()
+        if self.renew_thread:
+            self.renew_thread.join()
+
     def read_fullchain(self):
         return open(self.fullchain_path, 'rb').read()
     
@@ -3,34 +3,39 @@ import os
 import _thread
 import datetime
 import pickle
+from threading import Lock
+
+STATUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backlog_status')
 
 class vodloader_status(dict):
 
     def __init__(self, user_id):
         self.user_id = user_id
+        self.lock = Lock()
+        self.file = self.get_file()
         self.load()
 
 
     def get_file(self):
-        pickle_dir = os.path.join(os.path.dirname(__file__), 'backlog_status')
-        if not os.path.isdir(pickle_dir): os.mkdir(pickle_dir)
-        return(os.path.join(pickle_dir, f'status_{self.user_id}.pickle'))
+        os.makedirs(STATUS_DIR, exist_ok=True)
+        return(os.path.join(STATUS_DIR, f'status_{self.user_id}.pickle'))
 
 
     def load(self):
-        pickle_file = self.get_file()
-        if os.path.exists(pickle_file):
-            with open(pickle_file, 'rb') as status_file:
-                self.update(pickle.load(status_file).copy())
+        if os.path.exists(self.file):
+            with open(self.file, 'rb') as status_file:
+                self.update(pickle.load(status_file))
         else:
             self.status = {}
             self.save()
 
 
     def save(self):
-        pickle_file = self.get_file()
-        with open(pickle_file, 'wb') as status_file:
-            pickle.dump(self.copy(), status_file)
+        with self.lock:
+            temp_file = f'{self.file}.tmp'
+            with open(temp_file, 'wb') as status_file:
+                pickle.dump(self.copy(), status_file)
+            os.replace(temp_file, self.file)
 
 
     def __del__(self):
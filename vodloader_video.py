@@ -1,5 +1,5 @@
 from vodloader_chapters import vodloader_chapters
-from threading import Thread
+from threading import Thread, local
 from math import floor
 import logging
 import os
@@ -8,16 +8,39 @@ import streamlink
 import requests
 import json
 import pytz
+import re
+
+FORMAT_DIRECTIVES = {
+    '%': lambda video: '%',
+    'C': lambda video: video.parent.channel,
+    'i': lambda video: video.id,
+    'g': lambda video: video.chapters.get_first_game(),
+    'G': lambda video: video.chapters.get_current_game(),
+    't': lambda video: video.chapters.get_first_title(),
+    'T': lambda video: video.chapters.get_current_title(),
+}
+FORMAT_REGEX = re.compile(f'%([{"".join(FORMAT_DIRECTIVES)}])')
+FILTER_TABLE = str.maketrans('', '', '<>|')
+CHUNK_SIZE = 1024 * 1024
+PAGE_CACHE_DROP_INTERVAL = 128 * 1024 * 1024
+KRAKEN_SESSIONS = local()
+
+
+def get_kraken_session():
+    if not hasattr(KRAKEN_SESSIONS, 'session'):
+        KRAKEN_SESSIONS.session = requests.Session()
+    return KRAKEN_SESSIONS.session
 
 
 class vodloader_video(object):
 
-    def __init__(self, parent, url, twitch_data, backlog=False, quality='best', part=1):
+    def __init__(self, parent, url, twitch_data, backlog=False, quality='best', part=1, stream=None):
         self.parent = parent
         self.logger = logging.getLogger(f'vodloader.{self.parent.channel}.video')
         self.part = part
         self.backlog = backlog
         self.quality = quality
+        self.stream = stream
         self.passed = False
         self.upload = self.parent.upload
         self.keep = self.parent.keep
@@ -29,7 +52,7 @@ class vodloader_video(object):
         else:
             self.start_absolute = twitch_data['started_at']
             self.id = twitch_data['id']
-        self.start_absolute = pytz.timezone('UTC').localize(datetime.datetime.strptime(self.start_absolute, '%Y-%m-%dT%H:%M:%SZ'))
+        self.start_absolute = pytz.utc.localize(datetime.datetime.strptime(self.start_absolute, '%Y-%m-%dT%H:%M:%SZ'))
         self.start_absolute = self.start_absolute.astimezone(self.parent.tz)
         self.start = datetime.datetime.now()
         self.download_url = url
@@ -62,9 +85,9 @@ class vodloader_video(object):
         if self.upload and self.parent.status[self.id] != True:
             self.upload_stream()
 
-    def download_stream(self, chunk_size=8192, max_length=60*(60*12-15), retry=10):
+    def download_stream(self, chunk_size=CHUNK_SIZE, max_length=60*(60*12-15), retry=10):
         self.logger.info(f'Downloading stream from {self.download_url} to {self.path}')
-        stream = self.get_stream(self.download_url, self.quality)
+        stream = self.stream or self.get_stream(self.download_url, self.quality)
         buff = stream.open()
         if self.backlog:
             seglen = buff.worker.playlist_sequences[0].segment.duration
@@ -74,7 +97,8 @@ class vodloader_video(object):
                 stream.start_offset = (self.part - 1) * (max_length - 60 * seglen * (self.part - 1))
                 buff = stream.open()
         error = 0
-        with open(self.path, 'wb') as f:
+        unreleased = 0
+        with open(self.path, 'wb', buffering=chunk_size) as f:
             data = buff.read(chunk_size)
             while data and error < retry:
                 if self.parent.end:
@@ -82,10 +106,14 @@ class vodloader_video(object):
                     exit()
                 try:
                     f.write(data)
+                    unreleased += len(data)
                     data = buff.read(chunk_size)
                 except OSError as err:
                     self.logger.error(err)
                     error += 1
+                if unreleased >= PAGE_CACHE_DROP_INTERVAL:
+                    self.drop_page_cache(f)
+                    unreleased = 0
                 if self.backlog:
                     should_pass = buff.worker.playlist_sequence > (seq_limit - 2)
                     should_close = buff.worker.playlist_sequence > seq_limit
@@ -99,7 +127,7 @@ class vodloader_video(object):
                     twitch_data['game_name'] = self.chapters.get_current_game()
                     twitch_data['title'] = self.chapters.get_current_title()
                     if self.backlog:
-                        self.parent.backlog_video = vodloader_video(self.parent, self.download_url, twitch_data, backlog=self.backlog, quality=self.quality, part=self.part+1)
+                        self.parent.backlog_video = vodloader_video(self.parent, self.download_url, twitch_data, backlog=self.backlog, quality=self.quality, part=self.part+1, stream=stream)
                     else:
                         self.parent.livestream = vodloader_video(self.parent, self.download_url, twitch_data, backlog=self.backlog, quality=self.quality, part=self.part+1)
                 if should_close:
@@ -110,33 +138,50 @@ class vodloader_video(object):
         self.parent.status.save()
         self.logger.info(f'Finished downloading stream from {self.download_url}')
 
+    def drop_page_cache(self, f):
+        if hasattr(os, 'posix_fadvise'):
+            try:
+                f.flush()
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            except OSError as err:
+                self.logger.error(err)
+
     def upload_stream(self, chunk_size=4194304, retry=3):
-        self.parent.uploader.queue.append((self.path, self.get_youtube_body(self.parent.chapters_type), self.id, self.keep))
+        self.parent.uploader.queue.put((self.path, self.get_youtube_body(self.parent.chapters_type), self.id, self.keep))
     
     def get_youtube_body(self, chapters=False):
+        youtube_args = self.parent.uploader.youtube_args
         tvid = f'tvid:{self.id}'
         timestamp = f'timestamp:{self.start_absolute.timestamp()}'
         if self.part == 1 and self.passed: tvid += f'p{self.part}'
         body = {
             'snippet': {
-                'title': self.get_formatted_string(self.parent.uploader.youtube_args['title'], self.start_absolute),
-                'description': self.get_formatted_string(self.parent.uploader.youtube_args['description'], self.start_absolute),
+                'title': self.get_formatted_string(youtube_args['title'], self.start_absolute),
+                'description': self.get_formatted_string(youtube_args['description'], self.start_absolute),
                 'tags': [tvid, timestamp]
         },
             'status': {
                 'selfDeclaredMadeForKids': False
             }
         }
-        if 'tags' in self.parent.uploader.youtube_args: body['snippet']['tags'] += self.parent.uploader.youtube_args['tags']
-        if 'categoryId' in self.parent.uploader.youtube_args: body['snippet']['categoryId'] = self.parent.uploader.youtube_args['categoryId']
-        if 'privacy' in self.parent.uploader.youtube_args: body['status']['privacyStatus'] = self.parent.uploader.youtube_args['privacy']
+        tags = youtube_args.get('tags')
+        category_id = youtube_args.get('categoryId')
+        privacy = youtube_args.get('privacy')
+        if tags is not None: body['snippet']['tags'] += tags
+        if category_id is not None: body['snippet']['categoryId'] = category_id
+        if privacy is not None: body['status']['privacyStatus'] = privacy
         if not self.backlog:
             body['snippet']['tags'] += self.chapters.get_games()
             if chapters:
-                if chapters.lower() == 'games' and self.chapters.get_game_chapters():
-                    body['snippet']['description'] += f'\n\n\n\n{self.chapters.get_game_chapters()}'
-                if chapters.lower() == 'titles' and self.chapters.get_title_chapters():
-                    body['snippet']['description'] += f'\n\n\n\n{self.chapters.get_title_chapters()}'
+                chapters = chapters.lower()
+                if chapters == 'games':
+                    chapter_list = self.chapters.get_game_chapters()
+                elif chapters == 'titles':
+                    chapter_list = self.chapters.get_title_chapters()
+                else:
+                    chapter_list = None
+                if chapter_list:
+                    body['snippet']['description'] += f'\n\n\n\n{chapter_list}'
         if self.part > 1:
             body['snippet']['title'] = f'{body["snippet"]["title"]} Part {self.part}'
         body['snippet']['title'] = self.filter_string(body['snippet']['title'])
@@ -145,34 +190,26 @@ class vodloader_video(object):
     
     @staticmethod
     def filter_string(s):
-        nono_chars = '<>|'
-        return ''.join([x for x in s if not x in nono_chars])
+        return s.translate(FILTER_TABLE)
 
     def get_formatted_string(self, input, date):
-        output = input.replace('%C', self.parent.channel)
-        output = output.replace('%i', self.id)
-        output = output.replace('%g', self.chapters.get_first_game())
-        output = output.replace('%G', self.chapters.get_current_game())
-        output = output.replace('%t', self.chapters.get_first_title())
-        output = output.replace('%t', self.chapters.get_current_title())
+        output = FORMAT_REGEX.sub(lambda x: FORMAT_DIRECTIVES[x.group(1)](self).replace('%', '%%'), input)
         output = date.strftime(output)
         return output
     
-    def get_stream_markers(self, retry=3):
-        url = f'https://api.twitch.tv/kraken/videos/{self.vod_id}/markers?api_version=5&client_id={self.parent.twitch.app_id}'
+    def get_kraken_video(self, endpoint='', retry=3):
+        url = f'https://api.twitch.tv/kraken/videos/{self.vod_id}{endpoint}?api_version=5&client_id={self.parent.twitch.app_id}'
         for i in range(retry):
-            r = requests.get(url)
+            r = get_kraken_session().get(url)
             if r.status_code == 200:
                 return json.loads(r.content)
         return None
 
+    def get_stream_markers(self, retry=3):
+        return self.get_kraken_video('/markers', retry)
+
     def get_video(self, retry=3):
-        url = f'https://api.twitch.tv/kraken/videos/{self.vod_id}?api_version=5&client_id={self.parent.twitch.app_id}'
-        for i in range(retry):
-            r = requests.get(url)
-            if r.status_code == 200:
-                return json.loads(r.content)
-        return None
+        return self.get_kraken_video(retry=retry)
 
     def get_vod_chapters(self):
         video = self.get_video()
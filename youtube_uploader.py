@@ -5,6 +5,8 @@ from googleapiclient.http import MediaFileUpload
 from googleapiclient.errors import HttpError
 from time import sleep
 from threading import Thread
+from queue import Queue
+from collections import defaultdict
 from tzlocal import get_localzone
 import pytz
 import os
@@ -12,6 +14,14 @@ import pickle
 import json
 import datetime
 import logging
+import re
+
+TVID_REGEX = re.compile(r'(\d+)(?:p(\d+))?')
+QUOTA_TIMEZONE = pytz.timezone('US/Pacific')
+YOUTUBE_SCOPES = ('https://www.googleapis.com/auth/youtube.upload', 'https://www.googleapis.com/auth/youtube')
+YOUTUBE_API_NAME = 'youtube'
+YOUTUBE_API_VERSION = 'v3'
+PICKLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pickles')
 
 
 class youtube_uploader():
@@ -25,22 +35,20 @@ class youtube_uploader():
         self.jsonfile = jsonfile
         self.youtube_args = youtube_args
         self.youtube = self.setup_youtube(jsonfile)
-        self.queue = []
+        self.queue = Queue()
         self.upload_process = Thread(target=self.upload_loop, args=(), daemon=True)
         self.upload_process.start()
 
     def stop(self):
         self.end = True
+        self.queue.put(None)
 
-    def setup_youtube(self, jsonfile, scopes=['https://www.googleapis.com/auth/youtube.upload', 'https://www.googleapis.com/auth/youtube']):
+    def setup_youtube(self, jsonfile, scopes=YOUTUBE_SCOPES):
         self.logger.info(f'Building YouTube flow for {self.parent.channel}')
-        api_name='youtube'
-        api_version = 'v3'
-        pickle_dir = os.path.join(os.path.dirname(__file__), 'pickles')
-        if not os.path.exists(pickle_dir):
+        if not os.path.exists(PICKLE_DIR):
             self.logger.info(f'Creating pickle directory')
-            os.mkdir(pickle_dir)
-        pickle_file = os.path.join(pickle_dir, f'token_{self.parent.channel}.pickle')
+            os.mkdir(PICKLE_DIR)
+        pickle_file = os.path.join(PICKLE_DIR, f'token_{self.parent.channel}.pickle')
         creds = None
         if os.path.exists(pickle_file):
             with open(pickle_file, 'rb') as token:
@@ -51,25 +59,26 @@ class youtube_uploader():
                 creds.refresh(Request())
             else:
                 print(f'Please log into the YouTube account that will host the vods of {self.parent.channel} below')
-                flow = InstalledAppFlow.from_client_secrets_file(jsonfile, scopes)
+                flow = InstalledAppFlow.from_client_secrets_file(jsonfile, list(scopes))
                 creds = flow.run_console()
             with open(pickle_file, 'wb') as token:
                 pickle.dump(creds, token)
                 self.logger.info(f'YouTube credential pickle file for {self.parent.channel} has been written to {pickle_file}')
         else:
             self.logger.info(f'YouTube credential pickle file for {self.parent.channel} found!')
-        return build(api_name, api_version, credentials=creds)
+        return build(YOUTUBE_API_NAME, YOUTUBE_API_VERSION, credentials=creds)
 
     def upload_loop(self):
-        while True:
-            if len(self.queue) > 0:
+        while not self.end:
+            upload = self.queue.get()
+            if upload is None:
+                break
+            while not self.end:
                 try:
-                    self.upload_video(*self.queue[0])
-                    del self.queue[0]
+                    self.upload_video(*upload)
+                    break
                 except YouTubeOverQuota as e:
                     self.wait_for_quota()
-            else: sleep(1)
-            if self.end: break
 
     def upload_video(self, path, body, id, keep=False, chunk_size=4194304, retry=3):
         self.logger.info(f'Uploading file {path} to YouTube account for {self.parent.channel}')
@@ -114,7 +123,7 @@ class youtube_uploader():
         now = datetime.datetime.now()
         until = now + datetime.timedelta(days=1)
         until = until - datetime.timedelta(microseconds=until.microsecond, seconds=until.second, minutes=until.minute, hours=until.hour)
-        until = pytz.timezone('US/Pacific').localize(until)
+        until = QUOTA_TIMEZONE.localize(until)
         now = get_localzone().localize(now)
         wait = until - now
         if wait.days > 0:
@@ -188,16 +197,10 @@ class youtube_uploader():
     @staticmethod
     def get_tvid_from_yt_video(video):
         tvid = youtube_uploader.parse_tags(video, 'tvid')
-        if tvid:
-            tvid = tvid.split('p')
-            id = "".join(filter(str.isdigit, tvid[0]))
-            id = int(id)
-            if len(tvid) > 1:
-                part = "".join(filter(str.isdigit, tvid[1]))
-                part = int(part)
-            else:
-                part = None
-            return id, part
+        match = TVID_REGEX.search(tvid) if tvid else None
+        if match:
+            id, part = match.groups()
+            return int(id), int(part) if part else None
         else: return None, None
     
     @staticmethod
@@ -210,11 +213,11 @@ class youtube_uploader():
     @staticmethod
     def parse_tags(video, tag_id:str):
         tag_id = tag_id + ':'
+        offset = len(tag_id)
         result = None
-        if 'tags' in video['snippet']:
-            for tag in video['snippet']['tags']:
-                if tag[:len(tag_id)] == tag_id:
-                    result = tag[len(tag_id):]
+        for tag in video['snippet'].get('tags', ()):
+            if tag.startswith(tag_id):
+                result = tag[offset:]
         return result
 
     def add_video_to_playlist(self, video_id, playlist_id, pos=-1):
@@ -293,25 +296,17 @@ class youtube_uploader():
             if reverse:
                 self.add_video_to_playlist(video['id'], playlist_id, pos=0)
             else:
-                self.add_video_to_playlist(video['id'], playlist_id, pos=-1)
+                self.add_video_to_playlist(video['id'], playlist_id, pos=len(playlist_items))
                     
 
     def check_sortable(self, videos):
-        dupes = {}
-        no_part = []
+        timestamp_counts = defaultdict(int)
         no_id = []
         for video in videos:
             if video['tvid'] == None or video['timestamp'] == None:
                 no_id.append(video['id'])
-            if video['timestamp'] in dupes:
-                dupes[video['timestamp']].append(video)
-            else:
-                dupes[video['timestamp']] = [video]
-        for timestamp in dupes:
-            if len(dupes[timestamp]) > 1:
-                for video in dupes[timestamp]:
-                    if video['part'] == None:
-                        no_part.append(video['id'])
+            timestamp_counts[video['timestamp']] += 1
+        no_part = [video['id'] for video in videos if video['part'] == None and timestamp_counts[video['timestamp']] > 1]
         if no_id != []:
             self.logger.error(f"There were videos found in the specified playlist to be sorted without a valid tvid or timestamp tag. As such this playlist cannot be reliably sorted. The videos specified are: {','.join(no_id)}")
             return False